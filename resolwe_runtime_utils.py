@@ -26,6 +26,7 @@ import shlex
 import shutil
 import socket
 import subprocess
+import sys
 import tarfile
 import time
 import zlib
@@ -53,6 +54,24 @@ logger = logging.getLogger(__name__)
 if not hasattr(json, 'JSONDecodeError'):
     json.JSONDecodeError = ValueError
 
+# Use orjson for (de)serialization when available: it is considerably faster
+# than the stdlib codec and these helpers are called for every emitted value.
+try:
+    import orjson
+
+    def _loads(value):
+        """Deserialize JSON with orjson."""
+        return orjson.loads(value)
+
+    def _dumps(value):
+        """Serialize JSON with orjson."""
+        # orjson returns bytes, callers expect a string.
+        return orjson.dumps(value).decode()
+
+except ImportError:
+    _loads = json.loads
+    _dumps = json.dumps
+
 
 OutputType = Enum("OutputType", "Value FileDir Storage")
 
@@ -126,22 +145,27 @@ def _receive_data(socket, header_size=8):
     message_size = int.from_bytes(message, byteorder="big")
     message = _read_bytes(socket, message_size)
     assert len(message) == message_size
-    data = json.loads(message.decode("utf-8"))
+    data = _loads(message)
     return data
 
 
 def _get_json(value):
     """Convert the given value to a JSON object."""
-    if hasattr(value, 'replace'):
-        value = value.replace('\n', ' ')
+    if isinstance(value, str):
+        # Test for newlines first to avoid allocating a copy of the string
+        # in the common case where there are none.
+        if '\n' in value:
+            value = value.replace('\n', ' ')
+        if value[:1] not in '{["0123456789-tfn \t\r':
+            # The value cannot start a JSON document (allowing for leading
+            # whitespace), so parsing it is guaranteed to fail and it should
+            # be treated as a plain string.
+            return value
     try:
-        return json.loads(value)
+        return _loads(value)
     except json.JSONDecodeError:
-        # Escape double quotes.
-        if hasattr(value, 'replace'):
-            value = value.replace('"', '\\"')
-        # try putting the value into a string
-        return json.loads('"{}"'.format(value))
+        # Not valid JSON, treat the value as a plain string.
+        return value
 
 
 def command(name, data):
@@ -175,7 +199,7 @@ def send_message(data, header_size=8):
 
     try:
         sock = _connect(str(COMMUNICATOR_SOCKET))
-        message = json.dumps(data).encode()
+        message = _dumps(data).encode()
         message_length = len(message).to_bytes(header_size, byteorder="big")
         sock.sendall(message_length)
         sock.sendall(message)
@@ -303,7 +327,7 @@ def _preprocess_data(data):
     elif value_type == OutputType.Storage:
         try:
             file_content = Path(data).read_text()
-            data = json.loads(file_content)
+            data = _loads(file_content)
         except json.JSONDecodeError:
             raise RuntimeError(
                 "Value must be a valid JSON, current: {}".format(file_content)
@@ -311,15 +335,38 @@ def _preprocess_data(data):
     return data
 
 
-def _get_dir_size(path):
-    """Get directory size.
+# Check references in parallel above this many paths; below it the cost of
+# spinning up the pool outweighs the saved stat() latency.
+PARALLEL_REFS_THRESHOLD = 8
 
-    :param path: a Path object pointing to the directory.
-    :type path: pathlib.Path
+
+def _missing_refs(refs, cache=None):
+    """Return the references that do not exist on the filesystem.
+
+    Existence checks are cached, so a reference shared by multiple
+    entries is only stat'ed once. Large batches are checked with a small
+    thread pool: stat() releases the GIL and the checks are independent,
+    which hides the per-call latency on network filesystems.
     """
-    return sum(
-        file_.stat().st_size for file_ in Path(path).rglob("*") if file_.is_file()
-    )
+    if cache is None:
+        cache = {}
+    # Look the functions up once per call instead of once per reference.
+    isfile, isdir = os.path.isfile, os.path.isdir
+
+    def exists(ref):
+        return isfile(ref) or isdir(ref)
+
+    unchecked = [ref for ref in dict.fromkeys(refs) if ref not in cache]
+    if len(unchecked) > PARALLEL_REFS_THRESHOLD:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            cache.update(zip(unchecked, executor.map(exists, unchecked)))
+    else:
+        for ref in unchecked:
+            cache[ref] = exists(ref)
+
+    return [ref for ref in refs if not cache[ref]]
 
 
 def save_list(key, *values):
@@ -356,22 +403,23 @@ def save_file(key, file_path, *refs):
     if not path.is_file():
         return error("Output '{}' set to a missing file: '{}'.".format(key, file_path))
 
-    data = {"file": file_path}
-
     if refs:
-        missing_refs = [
-            ref for ref in refs if not (os.path.isfile(ref) or os.path.isdir(ref))
-        ]
+        missing_refs = _missing_refs(refs)
         if len(missing_refs) > 0:
             return error(
                 "Output '{}' set to missing references: '{}'.".format(
                     key, ', '.join(missing_refs)
                 )
             )
+
+    entry_size, refs_size = collect_entry(file_path, refs or [])
+    data = {
+        "file": file_path,
+        "size": entry_size,
+        "total_size": entry_size + refs_size,
+    }
+    if refs:
         data['refs'] = refs
-    entry_size, refs_size = collect_entry(data["file"], data.get("refs", []))
-    data["size"] = entry_size
-    data["total_size"] = entry_size + refs_size
     return command("update_output", {key: data})
 
 
@@ -387,41 +435,40 @@ def save_file_list(key, *files_refs):
     { key: {"file": file_path, "refs": [refs[0], refs[1], ... ]}}
 
     """
-    file_list = []
+    entries = []
+    ref_cache = {}
     for file_refs in files_refs:
-        if ':' in file_refs:
-            try:
-                file_name, refs = file_refs.split(':')
-            except ValueError as e:
-                return error("Only one colon ':' allowed in file-refs specification.")
-        else:
-            file_name, refs = file_refs, None
+        file_name, _, refs = file_refs.partition(':')
+        if ':' in refs:
+            return error("Only one colon ':' allowed in file-refs specification.")
         path = Path(file_name)
         if not path.is_file():
             return error(
                 "Output '{}' set to a missing file: '{}'.".format(key, file_name)
             )
-        file_obj = {'file': file_name}
-
         if refs:
             refs = [ref_path.strip() for ref_path in refs.split(',')]
-            missing_refs = [
-                ref for ref in refs if not (os.path.isfile(ref) or os.path.isdir(ref))
-            ]
+            missing_refs = _missing_refs(refs, ref_cache)
             if len(missing_refs) > 0:
                 return error(
                     "Output '{}' set to missing references: '{}'.".format(
                         key, ', '.join(missing_refs)
                     )
                 )
-            file_obj['refs'] = refs
 
-        file_list.append(file_obj)
+        entries.append((file_name, refs))
 
-    for data in file_list:
-        entry_size, refs_size = collect_entry(data["file"], data.get("refs", []))
-        data["size"] = entry_size
-        data["total_size"] = entry_size + refs_size
+    file_list = []
+    for file_name, refs in entries:
+        entry_size, refs_size = collect_entry(file_name, refs or [])
+        file_obj = {
+            'file': file_name,
+            "size": entry_size,
+            "total_size": entry_size + refs_size,
+        }
+        if refs:
+            file_obj['refs'] = refs
+        file_list.append(file_obj)
     return command("update_output", {key: file_list})
 
 
@@ -439,26 +486,24 @@ def save_dir(key, dir_path, *refs):
             "Output '{}' set to a missing directory: '{}'.".format(key, dir_path)
         )
 
-    result = {key: {"dir": dir_path, "size": _get_dir_size(path)}}
-
     if refs:
-        missing_refs = [
-            ref for ref in refs if not (os.path.isfile(ref) or os.path.isdir(ref))
-        ]
+        missing_refs = _missing_refs(refs)
         if len(missing_refs) > 0:
             return error(
                 "Output '{}' set to missing references: '{}'.".format(
                     key, ', '.join(missing_refs)
                 )
             )
-        result[key]["refs"] = refs
 
-    entry_size, refs_size = collect_entry(
-        result[key]["dir"], result[key].get("refs", [])
-    )
-    result[key]["size"] = entry_size
-    result[key]["total_size"] = entry_size + refs_size
-    return command("update_output", result)
+    entry_size, refs_size = collect_entry(dir_path, refs or [])
+    data = {
+        "dir": dir_path,
+        "size": entry_size,
+        "total_size": entry_size + refs_size,
+    }
+    if refs:
+        data["refs"] = refs
+    return command("update_output", {key: data})
 
 
 def save_dir_list(key, *dirs_refs):
@@ -473,63 +518,58 @@ def save_dir_list(key, *dirs_refs):
     { key: {"dir": dir_path, "refs": [refs[0], refs[1], ... ]}}
 
     """
-    dir_list = []
+    entries = []
+    ref_cache = {}
     for dir_refs in dirs_refs:
-        if ':' in dir_refs:
-            try:
-                dir_path, refs = dir_refs.split(':')
-            except ValueError as e:
-                return error("Only one colon ':' allowed in dir-refs specification.")
-        else:
-            dir_path, refs = dir_refs, None
+        dir_path, _, refs = dir_refs.partition(':')
+        if ':' in refs:
+            return error("Only one colon ':' allowed in dir-refs specification.")
 
         path = Path(dir_path)
         if not path.is_dir():
             return error(
                 "Output '{}' set to a missing directory: '{}'.".format(key, dir_path)
             )
-        dir_obj = {'dir': dir_path, "size": _get_dir_size(path)}
 
         if refs:
             refs = [ref_path.strip() for ref_path in refs.split(',')]
-            missing_refs = [
-                ref for ref in refs if not (os.path.isfile(ref) or os.path.isdir(ref))
-            ]
+            missing_refs = _missing_refs(refs, ref_cache)
             if len(missing_refs) > 0:
                 return error(
                     "Output '{}' set to missing references: '{}'.".format(
                         key, ', '.join(missing_refs)
                     )
                 )
-            dir_obj['refs'] = refs
 
-        dir_list.append(dir_obj)
+        entries.append((dir_path, refs))
 
-    for data in dir_list:
-        entry_size, refs_size = collect_entry(data["dir"], data.get("refs", []))
-        data["size"] = entry_size
-        data["total_size"] = entry_size + refs_size
+    dir_list = []
+    for dir_path, refs in entries:
+        entry_size, refs_size = collect_entry(dir_path, refs or [])
+        dir_obj = {
+            'dir': dir_path,
+            "size": entry_size,
+            "total_size": entry_size + refs_size,
+        }
+        if refs:
+            dir_obj['refs'] = refs
+        dir_list.append(dir_obj)
     return command("update_output", {key: dir_list})
 
 
-def _process_log(type, value):
-    """Construct general process_log command."""
-    return command("process_log", {type: value})
-
-
 def info(value):
     """Construct info command."""
-    return _process_log("info", value)
+    return command("process_log", {"info": value})
 
 
 def warning(value):
     """Construct warning command."""
-    return _process_log("warning", value)
+    return command("process_log", {"warning": value})
 
 
 def error(value):
     """Construct error command."""
-    return _process_log("error", value)
+    return command("process_log", {"error": value})
 
 
 def progress(progress):
@@ -538,11 +578,12 @@ def progress(progress):
     Progress is reported as float between 0 and 1 and sent to listener as int
     between 0 and 100.
     """
-    if isinstance(progress, int) or isinstance(progress, float):
+    try:
         progress = float(progress)
-    else:
+    except (TypeError, ValueError):
         try:
-            progress = float(json.loads(progress))
+            # Strings may carry a JSON-encoded number, e.g. '"0.5"'.
+            progress = float(_loads(progress))
         except (TypeError, ValueError):
             return warning("Progress must be a float.")
 
@@ -552,6 +593,18 @@ def progress(progress):
     return command("progress", round(progress * 100))
 
 
+def _is_return_code(value):
+    """Check if the given value can be interpreted as a return code."""
+    if isinstance(value, int):
+        return True
+    if not isinstance(value, str):
+        return False
+    digits = value[1:] if value[:1] in '+-' else value
+    # isdecimal() accepts exactly the digit characters int() does, unlike
+    # isdigit(), which also accepts e.g. superscripts that int() rejects.
+    return digits.isdecimal()
+
+
 def checkrc(rc, *args):
     """Check if ``rc`` (return code) meets requirements.
 
@@ -568,24 +621,22 @@ def checkrc(rc, *args):
     where "proc.error" entry is omitted if empty.
 
     """
-    try:
-        rc = int(rc)
-    except (TypeError, ValueError):
+    if not _is_return_code(rc):
         return error("Invalid return code: '{}'.".format(rc))
+    rc = int(rc)
 
     acceptable_rcs = []
     error_msg = ""
 
     if len(args):
         for code in args[:-1]:
-            try:
-                acceptable_rcs.append(int(code))
-            except (TypeError, ValueError):
+            if not _is_return_code(code):
                 return error("Invalid return code: '{}'.".format(code))
+            acceptable_rcs.append(int(code))
 
-        try:
+        if _is_return_code(args[-1]):
             acceptable_rcs.append(int(args[-1]))
-        except (TypeError, ValueError):
+        else:
             error_msg = args[-1]
 
     if rc in acceptable_rcs:
@@ -849,8 +900,6 @@ def import_file(
 
 def _re_generic_main(fn):
     """Main method."""
-    import sys
-
     try:
         data = fn(*sys.argv[1:])
     except Exception as exc:
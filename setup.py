@@ -63,10 +63,12 @@ setuptools.setup(
     extras_require={
         'dev': ['tox'],
         'docs': ['Sphinx', 'sphinx_rtd_theme'],
+        'fast': ['orjson'],
         'package': ['twine', 'wheel'],
         'test': [
             'black',
             'check-manifest',
+            'orjson',
             'readme',
             'pytest-cov',
             'responses',
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import importlib
 import json
 import os
 import shutil
@@ -70,6 +71,26 @@ class ResolweRuntimeUtilsTestCase(TestCase):
         self.assertEqual(json.loads(json_), json.loads(expected_json))
 
 
+class TestJSONShim(ResolweRuntimeUtilsTestCase):
+    def test_stdlib_fallback(self):
+        import resolwe_runtime_utils
+
+        try:
+            # Block the orjson import so the module falls back to stdlib json.
+            with patch.dict(sys.modules, {'orjson': None}):
+                module = importlib.reload(resolwe_runtime_utils)
+                self.assertIs(module._loads, json.loads)
+                self.assertIs(module._dumps, json.dumps)
+                expected = {
+                    'type': 'COMMAND',
+                    'type_data': 'update_output',
+                    'data': {'foo': 0},
+                }
+                self.assertEqual(module.save('foo', '0'), expected)
+        finally:
+            importlib.reload(resolwe_runtime_utils)
+
+
 class TestAnnotate(ResolweRuntimeUtilsTestCase):
     def test_annotation(self):
         expected = {'type': 'COMMAND', 'type_data': 'annotate', 'data': {'foo': 0}}
@@ -81,6 +102,10 @@ class TestSave(ResolweRuntimeUtilsTestCase):
         expected = {'type': 'COMMAND', 'type_data': 'update_output', 'data': {'foo': 0}}
         self.assertEqual(save('foo', '0'), expected)
 
+    def test_number_leading_whitespace(self):
+        expected = {'type': 'COMMAND', 'type_data': 'update_output', 'data': {'foo': 5}}
+        self.assertEqual(save('foo', ' 5'), expected)
+
     def test_quote(self):
         expected = {
             'type': 'COMMAND',
@@ -101,6 +126,14 @@ class TestSave(ResolweRuntimeUtilsTestCase):
         expected["data"] = {'number': "0"}
         self.assertEqual(save('number', '"0"'), expected)
 
+    def test_backslashes_and_quotes(self):
+        expected = {
+            'type': 'COMMAND',
+            'type_data': 'update_output',
+            'data': {'foo': 'say "hi" \\b'},
+        }
+        self.assertEqual(save('foo', 'say "hi" \\b'), expected)
+
     @patch('resolwe_runtime_utils.collect_entry', return_value=(1, 1))
     def test_hash(self, collect_mock):
         expected = {
@@ -207,6 +240,40 @@ class TestSaveFile(ResolweRuntimeUtilsTestCase):
             expected,
         )
 
+    @patch('resolwe_runtime_utils.Path')
+    @patch('resolwe_runtime_utils.collect_entry', return_value=(42, 0))
+    @patch('os.path.isfile', return_value=True)
+    def test_file_with_many_refs(self, isfile_mock, collect_mock, path_mock):
+        # More references than PARALLEL_REFS_THRESHOLD, so the existence
+        # checks run through the thread pool.
+        path_mock.is_file.return_value = True
+        refs = tuple('ref{}.txt'.format(index) for index in range(10))
+        expected = {
+            'type': 'COMMAND',
+            'type_data': 'update_output',
+            'data': {
+                'etc': {'file': 'foo.py', 'size': 42, 'total_size': 42, 'refs': refs}
+            },
+        }
+        self.assertEqual(save_file('etc', 'foo.py', *refs), expected)
+
+    @patch('resolwe_runtime_utils.Path')
+    @patch('os.path.isdir', return_value=False)
+    @patch('os.path.isfile', side_effect=lambda ref: not ref.startswith('missing'))
+    def test_file_with_many_missing_refs(self, isfile_mock, isdir_mock, path_mock):
+        path_mock.is_file.return_value = True
+        refs = ['ref{}.txt'.format(index) for index in range(9)]
+        refs += ['missing1.txt', 'missing2.txt']
+        expected = {
+            'type': 'COMMAND',
+            'type_data': 'process_log',
+            'data': {
+                'error': "Output 'src' set to missing references: "
+                "'missing1.txt, missing2.txt'."
+            },
+        }
+        self.assertEqual(save_file('src', 'foo.py', *refs), expected)
+
     def test_missing_file(self):
         expected = {
             'type': 'COMMAND',
@@ -285,6 +352,14 @@ class TestSaveFileList(ResolweRuntimeUtilsTestCase):
             save_file_list('src', 'foo.py:ref1.gz,ref2.gz', 'bar.py'), expected
         )
 
+    @patch('resolwe_runtime_utils.collect_entry', side_effect=[(1, 1), (2, 1)])
+    @patch('resolwe_runtime_utils.Path')
+    @patch('os.path.isfile', return_value=True)
+    def test_shared_refs_checked_once(self, isfile_mock, path_mock, collect_mock):
+        path_mock.is_file.return_value = True
+        save_file_list('src', 'foo.py:ref.gz', 'bar.py:ref.gz')
+        self.assertEqual(isfile_mock.call_count, 1)
+
     def test_missing_file(self):
         expected = {
             'type': 'COMMAND',
@@ -523,6 +598,10 @@ class TestProgress(ResolweRuntimeUtilsTestCase):
         expected = {'type': 'COMMAND', 'type_data': 'progress', 'data': 100}
         self.assertEqual(progress('1'), expected)
 
+    def test_json_string(self):
+        expected = {'type': 'COMMAND', 'type_data': 'progress', 'data': 50}
+        self.assertEqual(progress('"0.5"'), expected)
+
     def test_bool(self):
         expected = {'type': 'COMMAND', 'type_data': 'progress', 'data': 100}
         self.assertEqual(progress(True), expected)
@@ -573,6 +652,15 @@ class TestCheckRC(ResolweRuntimeUtilsTestCase):
         }
         self.assertEqual(checkrc('1', '2', 'Error'), expected)
 
+    def test_non_decimal_digits(self):
+        expected = {
+            'type': 'COMMAND',
+            'type_data': 'process_log',
+            'data': {'error': "Invalid return code: '²'."},
+        }
+        self.assertEqual(checkrc('²'), expected)
+        self.assertEqual(checkrc(1, '²', 'Error'), expected)
+
     def test_error_message_not_string(self):
         expected = {
             'type': 'COMMAND',